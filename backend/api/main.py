@@ -1,12 +1,16 @@
 # backend/api/main.py
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache
+from typing import BinaryIO, List, Optional, Dict, Any, Tuple
 
-import io
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from starlette.datastructures import State
 
 # --- carregar .env ---
 import os
@@ -15,12 +19,13 @@ from dotenv import load_dotenv
 load_dotenv()  # Agora o backend lê GEMINI_API_KEY / GOOGLE_API_KEY do .env
 
 # Imports internos do projeto
-from ..db import create_db_and_tables, Measurement, DailyCep
+from ..db import create_db_and_tables, Alert, Measurement, DailyCep
 from ..models.digital_twin import DigitalTwinModel, EmaConfig
 from ..models.anomaly import AnomalyDetector, AnomalyConfig
 from ..models.sampling import SamplingEngine
-from ..models.cep import compute_cp_cpk, compute_daily_cep, detect_run_rules
+from ..models.cep import CepStats, compute_cp_cpk, detect_run_rules
 from ..services import datastore
+from ..services.aggregator import CepAggregator
 from ..services.llm_explainer import explain_anomalies, chat_with_process
 
 
@@ -28,8 +33,27 @@ from ..services.llm_explainer import explain_anomalies, chat_with_process
 LSL = 1025.0
 USL = 1032.0
 
+# Linhas do CSV processadas por vez no upload
+UPLOAD_CHUNK_SIZE = 10_000
+
+# Maior página aceita em /data/history
+HISTORY_MAX_LIMIT = 10_000
+
+# Metadados opcionais do processo aceitos no CSV
+META_COLUMNS = [
+    "product",
+    "operation",
+    "variable",
+    "machine",
+    "section",
+    "operator",
+    "sample_id",
+]
+
 
 # --------------- FASTAPI SETUP -----------------
+# As rotas declaram response_model: o FastAPI serializa a resposta direto
+# para bytes JSON via Pydantic (pydantic-core), sem jsonable_encoder
 app = FastAPI(title="SmartTwin CEP API")
 
 app.add_middleware(
@@ -41,12 +65,23 @@ app.add_middleware(
 )
 
 
-# --------------- ESTADO GLOBAL (MVP) -----------------
-digital_twin = DigitalTwinModel(EmaConfig(alpha=0.3))
-anomaly_detector = AnomalyDetector(AnomalyConfig())
+# --------------- ESTADO DO PIPELINE -----------------
+# Gêmeo, detector e agregador ficam em app.state (criados no startup) e todo
+# acesso a eles (escrita e leitura) acontece sob app.state.lock: o upload
+# atualiza o agregador em outra thread. O estado é por processo: com
+# `uvicorn --workers N` cada worker mantém o seu próprio gêmeo/detector.
 sampling_engine = SamplingEngine()
 
 
+def _reset_models(state: State) -> None:
+    state.twin = DigitalTwinModel(EmaConfig(alpha=0.3))
+    state.detector = AnomalyDetector(AnomalyConfig())
+
+
+def get_state(request: Request) -> State:
+    return request.app.state
+
+
 # --------------- MODELOS Pydantic -----------------
 class SimulateRequest(BaseModel):
     value: float
@@ -63,21 +98,112 @@ class ChatRequest(BaseModel):
     history: List[ChatMessage]
 
 
+# Modelos de resposta
+class HealthResponse(BaseModel):
+    status: str
+
+
+class MeasurementOut(BaseModel):
+    id: int
+    timestamp: datetime
+    value_real: float
+    value_pred: Optional[float] = None
+    residual: Optional[float] = None
+    zscore_residual: Optional[float] = None
+    iforest_score: Optional[float] = None
+    is_anomaly: Optional[bool] = None
+    sampling_level: Optional[str] = None
+    source: str
+    product: Optional[str] = None
+    operation: Optional[str] = None
+    variable: Optional[str] = None
+    machine: Optional[str] = None
+    section: Optional[str] = None
+    operator: Optional[str] = None
+    sample_id: Optional[int] = None
+
+
+class SimulateResponse(MeasurementOut):
+    sampling_reason: str
+
+
+class UploadResponse(BaseModel):
+    status: str
+    rows: int
+
+
+class DailyCepOut(BaseModel):
+    day: date
+    n: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    r: Optional[float] = None
+    cp: Optional[float] = None
+    cpk: Optional[float] = None
+    lsl: Optional[float] = None
+    usl: Optional[float] = None
+
+
+class RunRules(BaseModel):
+    rule1: List[int]
+    rule4: List[int]
+
+
+class OverviewResponse(BaseModel):
+    global_mean: float
+    global_std: float
+    global_r: float
+    global_cp: Optional[float] = None
+    global_cpk: Optional[float] = None
+    lsl: float
+    usl: float
+    total_points: int
+    total_anomalies: int
+    run_rules: RunRules
+
+
+class AlertOut(BaseModel):
+    id: int
+    created_at: datetime
+    level: str
+    message: str
+    meta: Optional[str] = None
+
+
+class ExplainResponse(BaseModel):
+    text: str
+
+
+class ChatResponse(BaseModel):
+    answer: str
+
+
 # --------------- EVENTO DE STARTUP -----------------
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    # Pool dedicado para o trabalho enviado via asyncio.to_thread (uploads)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=os.cpu_count())
+    )
     create_db_and_tables()
+
+    state = app.state
+    _reset_models(state)
+    state.aggregator = CepAggregator()
+    state.aggregator.rebuild(datastore.get_measurement_values())
+    state.lock = asyncio.Lock()
     print("🔧 Banco atualizado — variáveis do .env carregadas!")
 
 
 # --------------- HEALTH CHECK -----------------
-@app.get("/health")
+@app.get("/health", response_model=HealthResponse)
 def health():
     return {"status": "ok"}
 
 
 # --------------- PIPELINE PRINCIPAL -----------------
 def _process_value(
+    state: State,
     value: float,
     source: str,
     timestamp: Optional[datetime] = None,
@@ -90,17 +216,19 @@ def _process_value(
     3. Detecção de anomalia
     4. Decisão de amostragem
     5. Salvamento no banco (incluindo metadados do processo)
+
+    Deve ser chamado com state.lock adquirido.
     """
     # Previsão antes da atualização
-    pred_before = digital_twin.predict()
+    pred_before = state.twin.predict()
     if pred_before is None:
         pred_before = value
 
     residual = value - pred_before
 
     # Atualiza o detector
-    anomaly_detector.partial_update(residual)
-    scores = anomaly_detector.score_point(residual)
+    state.detector.partial_update(residual)
+    scores = state.detector.score_point(residual)
 
     # Decisão de amostragem
     decision = sampling_engine.decide(
@@ -109,7 +237,7 @@ def _process_value(
     )
 
     # Atualiza o gêmeo digital
-    digital_twin.update(value)
+    state.twin.update(value)
 
     meta = meta or {}
 
@@ -134,6 +262,7 @@ def _process_value(
         sample_id=meta.get("sample_id"),
     )
     m = datastore.add_measurement(m)
+    state.aggregator.add(m.value_real, m.timestamp, bool(m.is_anomaly), m.id)
 
     # Alerta automático em caso de anomalia
     if scores["is_anomaly"]:
@@ -166,39 +295,178 @@ def _process_value(
     }
 
 
-# --------------- INSERIR VALOR SIMULADO -----------------
-@app.post("/data/simulate-step")
-def simulate_step(req: SimulateRequest):
-    return _process_value(
-        req.value,
-        source=req.source,
-        timestamp=req.timestamp,
-        meta=None,
+def _process_batch(
+    state: State,
+    values: np.ndarray,
+    source: str,
+    timestamps: Optional[List[datetime]] = None,
+    meta: Optional[Dict[str, List[Any]]] = None,
+) -> int:
+    """
+    Versão vetorizada de _process_value para um lote de medições (upload):
+    previsões, resíduos e scores são calculados como arrays e todas as
+    medições são gravadas em uma única transação.
+
+    Deve ser chamado com state.lock adquirido.
+    """
+    n = len(values)
+    if n == 0:
+        return 0
+
+    preds = state.twin.predict_series(values)
+    scores = state.detector.score_batch(values - preds)
+
+    now = datetime.utcnow()
+    timestamps = [ts or now for ts in timestamps or [None] * n]
+    meta = meta or {}
+    meta_rows = zip(*(meta.get(col) or [None] * n for col in META_COLUMNS))
+    is_anomaly = scores["is_anomaly"].tolist()
+
+    models: List[Measurement] = []
+    for ts, val, pred, res, z, score_if, anomaly, meta_row in zip(
+        timestamps,
+        values.tolist(),
+        preds.tolist(),
+        scores["residual"].tolist(),
+        scores["zscore_residual"].tolist(),
+        scores["iforest_score"].tolist(),
+        is_anomaly,
+        meta_rows,
+    ):
+        product, operation, variable, machine, section, operator, sample_id = meta_row
+        decision = sampling_engine.decide(is_anomaly=anomaly, zscore_residual=z)
+        models.append(
+            Measurement(
+                timestamp=ts,
+                value_real=val,
+                value_pred=pred,
+                residual=res,
+                zscore_residual=z,
+                iforest_score=score_if,
+                is_anomaly=anomaly,
+                sampling_level=decision.level,
+                source=source,
+                product=product,
+                operation=operation,
+                variable=variable,
+                machine=machine,
+                section=section,
+                operator=operator,
+                sample_id=sample_id,
+            )
+        )
+    datastore.add_measurements_bulk(models)
+    state.aggregator.add_batch(
+        values.tolist(),
+        timestamps,
+        is_anomaly,
+        datastore.get_max_measurement_id(),
+    )
+
+    datastore.add_alerts_bulk(
+        [
+            Alert(
+                level="warning",
+                message=f"Anomalia detectada (valor={val:.3f})",
+                meta=None,
+            )
+            for val in values[scores["is_anomaly"]].tolist()
+        ]
     )
 
+    return n
+
+
+def _meta_columns(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    """
+    Converte as colunas de metadados presentes no CSV para o tipo do banco,
+    uma coluna inteira por vez (nullable dtypes do pandas; ausentes -> None).
+    """
+    meta: Dict[str, List[Any]] = {}
+    for col in META_COLUMNS:
+        if col not in df.columns:
+            continue
+        if col == "sample_id":
+            converted = np.trunc(pd.to_numeric(df[col], errors="coerce")).astype("Int64")
+        else:
+            converted = df[col].astype("string")
+        meta[col] = converted.to_numpy(dtype=object, na_value=None).tolist()
+    return meta
+
+
+# --------------- INSERIR VALOR SIMULADO -----------------
+@app.post("/data/simulate-step", response_model=SimulateResponse)
+async def simulate_step(req: SimulateRequest, state: State = Depends(get_state)):
+    async with state.lock:
+        return await asyncio.to_thread(
+            _process_value,
+            state,
+            req.value,
+            source=req.source,
+            timestamp=req.timestamp,
+            meta=None,
+        )
+
 
 # --------------- UPLOAD CSV -----------------
-@app.post("/data/upload-file")
-async def upload_file(file: UploadFile = File(...)):
-    content = await file.read()
+@app.post("/data/upload-file", response_model=UploadResponse)
+async def upload_file(file: UploadFile = File(...), state: State = Depends(get_state)):
+    # Só o início do arquivo é lido aqui (detecção do separador); o restante
+    # é consumido em blocos direto do arquivo temporário do upload
+    head = await file.read(4096)
+    await file.seek(0)
+    # Parsing + pipeline + gravação são bloqueantes: rodam fora do event loop.
+    # O lock é adquirido uma vez para o arquivo inteiro.
+    async with state.lock:
+        return await asyncio.to_thread(_upload_sync, state, file.file, head)
+
+
+def _upload_sync(state: State, stream: BinaryIO, head: bytes) -> Dict[str, Any]:
     try:
         # detecta separador automaticamente
-        sample = content[:500].decode("utf-8", errors="ignore")
+        sample = head.decode("utf-8", errors="ignore")
         header = sample.splitlines()[0]
         sep = ";" if ";" in header else ","
-        df = pd.read_csv(io.BytesIO(content), sep=sep)
+        chunks = pd.read_csv(
+            stream,
+            sep=sep,
+            chunksize=UPLOAD_CHUNK_SIZE,
+            dtype={"value": np.float64},
+        )
+        first = next(chunks)
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"Erro ao ler CSV: {e}",
         )
 
-    if "value" not in df.columns:
+    if "value" not in first.columns:
         raise HTTPException(
             status_code=400,
             detail="CSV deve conter, no mínimo, uma coluna chamada 'value'.",
         )
 
+    # Reset do estado in-memory (MVP). O estado do gêmeo e do detector segue
+    # de um bloco para o outro, então o resultado independe do chunksize.
+    _reset_models(state)
+
+    count = _process_upload_chunk(state, first)
+    try:
+        for chunk in chunks:
+            count += _process_upload_chunk(state, chunk)
+    except (ValueError, pd.errors.ParserError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Erro ao ler CSV após {count} linhas importadas: {e}",
+        )
+    finally:
+        _refresh_daily_cep(state.aggregator)
+        _analytics_snapshot.cache_clear()
+
+    return {"status": "ok", "rows": count}
+
+
+def _process_upload_chunk(state: State, df: pd.DataFrame) -> int:
     # 🔹 Monta série de timestamps se vierem colunas apropriadas
     ts_series = None
     if "timestamp" in df.columns:
@@ -208,113 +476,74 @@ async def upload_file(file: UploadFile = File(...)):
             df["date"].astype(str) + " " + df["hour"].astype(str)
         )
 
-    # Reset do estado in-memory (MVP)
-    global digital_twin, anomaly_detector
-    digital_twin = DigitalTwinModel(EmaConfig(alpha=0.3))
-    anomaly_detector = AnomalyDetector(AnomalyConfig())
-
-    count = 0
-    for idx, row in df.iterrows():
-        val = float(row["value"])
-
-        ts = (
-            ts_series.iloc[idx].to_pydatetime()
-            if ts_series is not None
-            else None
-        )
-
-        # Monta metadados se existirem
-        meta: Dict[str, Any] = {}
-        for col in [
-            "product",
-            "operation",
-            "variable",
-            "machine",
-            "section",
-            "operator",
-            "sample_id",
-        ]:
-            if col in df.columns:
-                v = row[col]
-                if pd.notna(v):
-                    if col == "sample_id":
-                        try:
-                            meta[col] = int(v)
-                        except Exception:
-                            meta[col] = None
-                    else:
-                        meta[col] = str(v)
-
-        _process_value(val, source="upload", timestamp=ts, meta=meta)
-        count += 1
-
-    _recompute_daily_cep()
+    values = df["value"].to_numpy(dtype=np.float64)
+    timestamps = (
+        pd.DatetimeIndex(ts_series).to_pydatetime().tolist()
+        if ts_series is not None
+        else None
+    )
 
-    return {"status": "ok", "rows": count}
+    return _process_batch(
+        state,
+        values,
+        source="upload",
+        timestamps=timestamps,
+        meta=_meta_columns(df),
+    )
 
 
-# --------------- HISTÓRICO COMPLETO -----------------
-@app.get("/data/history")
-def get_history():
-    measurements = datastore.get_all_measurements()
-    return [
-        {
-            "id": m.id,
-            "timestamp": m.timestamp.isoformat(),
-            "value_real": m.value_real,
-            "value_pred": m.value_pred,
-            "residual": m.residual,
-            "zscore_residual": m.zscore_residual,
-            "iforest_score": m.iforest_score,
-            "is_anomaly": m.is_anomaly,
-            "sampling_level": m.sampling_level,
-            "source": m.source,
-            "product": m.product,
-            "operation": m.operation,
-            "variable": m.variable,
-            "machine": m.machine,
-            "section": m.section,
-            "operator": m.operator,
-            "sample_id": m.sample_id,
-        }
-        for m in measurements
-    ]
+# --------------- HISTÓRICO (PAGINADO) -----------------
+@app.get("/data/history", response_model=List[MeasurementOut])
+def get_history(
+    limit: int = Query(1000, ge=1, le=HISTORY_MAX_LIMIT),
+    since_id: Optional[int] = Query(None, ge=0),
+):
+    return datastore.get_history_rows(limit=limit, since_id=since_id)
 
 
 # --------------- CEP DIÁRIO -----------------
-def _recompute_daily_cep():
-    measurements = datastore.get_all_measurements()
-    rows = [
-        {"timestamp": m.timestamp, "value_real": m.value_real}
-        for m in measurements
-    ]
-    daily_stats = compute_daily_cep(rows, lsl=LSL, usl=USL)
+def _refresh_daily_cep(aggregator: CepAggregator) -> None:
+    """
+    Grava em DailyCep apenas os dias alterados desde a última chamada
+    (UPSERT por dia), a partir das estatísticas diárias do agregador.
+
+    Deve ser chamado com state.lock adquirido.
+    """
+    days = aggregator.take_dirty_days()
+    if not days:
+        return
 
     daily_models: List[DailyCep] = []
-    for d in daily_stats:
+    for day in sorted(days):
+        stats = aggregator.daily[day].to_stats(lsl=LSL, usl=USL)
         daily_models.append(
             DailyCep(
-                day=datetime.fromisoformat(d["day"]).date(),
-                n=d["n"],
-                mean=d["mean"],
-                std=d["std"],
-                r=d["r"],
-                cp=d["cp"],
-                cpk=d["cpk"],
-                lsl=d["lsl"],
-                usl=d["usl"],
+                day=day,
+                n=stats.n,
+                mean=stats.mean,
+                std=stats.std,
+                r=stats.r,
+                cp=stats.cp,
+                cpk=stats.cpk,
+                lsl=stats.lsl,
+                usl=stats.usl,
             )
         )
-    datastore.save_daily_cep(daily_models)
+    try:
+        datastore.upsert_daily_cep(daily_models)
+    except Exception:
+        aggregator.mark_dirty(days)
+        raise
 
 
-@app.get("/analytics/daily-cep")
-def analytics_daily_cep():
-    _recompute_daily_cep()
-    daily = datastore.get_daily_cep()
+@app.get("/analytics/daily-cep", response_model=List[DailyCepOut])
+async def analytics_daily_cep(state: State = Depends(get_state)):
+    async with state.lock:
+        await asyncio.to_thread(_refresh_daily_cep, state.aggregator)
+    daily = await asyncio.to_thread(datastore.get_daily_cep)
     return [
         {
-            "day": d.day.isoformat(),
+            "day": d.day,
             "n": d.n,
             "mean": d.mean,
             "std": d.std,
@@ -329,14 +558,21 @@ def analytics_daily_cep():
 
 
 # --------------- ANALYTICS GLOBAL -----------------
-@app.get("/analytics/overview")
-def analytics_overview():
-    measurements = datastore.get_all_measurements()
-    values = [m.value_real for m in measurements]
-
-    stats = compute_cp_cpk(values, lsl=LSL, usl=USL)
-    run_rules = detect_run_rules(values)
-    total_anomalies = sum(1 for m in measurements if m.is_anomaly)
+@lru_cache(maxsize=1)
+def _run_rules(max_measurement_id: int) -> Dict[str, Any]:
+    """Run rules sobre a série completa, memoizadas pelo último id gravado."""
+    values = [row[2] for row in datastore.get_measurement_values()]
+    return detect_run_rules(values)
+
+
+@app.get("/analytics/overview", response_model=OverviewResponse)
+async def analytics_overview(state: State = Depends(get_state)):
+    # Leitura consistente do agregador (um upload pode estar no meio de add_batch)
+    async with state.lock:
+        stats = state.aggregator.overall(lsl=LSL, usl=USL)
+        total_anomalies = state.aggregator.total_anomalies
+        max_id = state.aggregator.max_measurement_id
+    run_rules = await asyncio.to_thread(_run_rules, max_id)
 
     return {
         "global_mean": stats.mean,
@@ -353,13 +589,13 @@ def analytics_overview():
 
 
 # --------------- ALERTAS -----------------
-@app.get("/alerts")
+@app.get("/alerts", response_model=List[AlertOut])
 def list_alerts(limit: int = 100):
     alerts = datastore.get_alerts(limit=limit)
     return [
         {
             "id": a.id,
-            "created_at": a.created_at.isoformat(),
+            "created_at": a.created_at,
             "level": a.level,
             "message": a.message,
             "meta": a.meta,
@@ -368,9 +604,14 @@ def list_alerts(limit: int = 100):
     ]
 
 
-# --------------- LLM: RELATÓRIO AUTOMÁTICO -----------------
-@app.post("/llm/explain")
-def llm_explain():
+# --------------- LLM: CONTEXTO NUMÉRICO -----------------
+@lru_cache(maxsize=1)
+def _analytics_snapshot(max_measurement_id: int) -> Tuple[CepStats, List[Dict[str, Any]]]:
+    """
+    Estatísticas globais + lista de anomalias usadas como contexto do LLM.
+    Memoizado pelo último id gravado: chamadas repetidas (ex.: chat) não
+    relêem a tabela, e qualquer nova medição muda a chave do cache.
+    """
     measurements = datastore.get_all_measurements()
     values = [m.value_real for m in measurements]
     stats = compute_cp_cpk(values, lsl=LSL, usl=USL)
@@ -385,6 +626,13 @@ def llm_explain():
         for m in measurements
         if m.is_anomaly
     ]
+    return stats, anomalies
+
+
+# --------------- LLM: RELATÓRIO AUTOMÁTICO -----------------
+@app.post("/llm/explain", response_model=ExplainResponse)
+def llm_explain():
+    stats, anomalies = _analytics_snapshot(datastore.get_max_measurement_id())
 
     context = (
         "Processo: envase de leite UHT. "
@@ -402,12 +650,9 @@ def llm_explain():
 
 
 # --------------- LLM: CHAT ESPECIALISTA -----------------
-@app.post("/llm/chat")
+@app.post("/llm/chat", response_model=ChatResponse)
 def llm_chat(req: ChatRequest):
-    measurements = datastore.get_all_measurements()
-    values = [m.value_real for m in measurements]
-    stats = compute_cp_cpk(values, lsl=LSL, usl=USL)
-    total_anomalies = sum(1 for m in measurements if m.is_anomaly)
+    stats, anomalies = _analytics_snapshot(datastore.get_max_measurement_id())
 
     summary = {
         "global_mean": stats.mean,
@@ -415,7 +660,7 @@ def llm_chat(req: ChatRequest):
         "global_cp": stats.cp,
         "global_cpk": stats.cpk,
         "total_points": stats.n,
-        "total_anomalies": total_anomalies,
+        "total_anomalies": len(anomalies),
     }
 
     history = [{"role": m.role, "content": m.content} for m in req.history]
@@ -2,17 +2,32 @@
 from datetime import datetime, date
 from typing import Optional
 
+from sqlalchemy import event
 from sqlmodel import SQLModel, Field, create_engine
 
 DATABASE_URL = "sqlite:///./smarttwin.db"
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args={"check_same_thread": False},
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _conn_record) -> None:
+    # WAL + synchronous=NORMAL: commits não fazem fsync do arquivo principal
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
 
 class Measurement(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
 
     # Tempo
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     # Variável de processo
     value_real: float
@@ -40,7 +55,7 @@ class Measurement(SQLModel, table=True):
 
 class DailyCep(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    day: date
+    day: date = Field(index=True, unique=True)
     n: int
     mean: Optional[float] = None
     std: Optional[float] = None
@@ -53,7 +68,7 @@ class DailyCep(SQLModel, table=True):
 
 class Alert(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     level: str
     message: str
     meta: Optional[str] = None
@@ -61,3 +76,21 @@ class Alert(SQLModel, table=True):
 
 def create_db_and_tables() -> None:
     SQLModel.metadata.create_all(engine)
+
+    # create_all não altera tabelas já existentes: garante os índices em
+    # bancos criados antes deles
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_measurement_timestamp ON measurement (timestamp)"
+        )
+        # DailyCep é derivada das medições: se o índice de `day` ainda não for
+        # UNIQUE (bancos antigos), a tabela é esvaziada e o índice recriado;
+        # os dias são regravados no próximo cálculo do CEP diário
+        indexes = conn.exec_driver_sql("PRAGMA index_list(dailycep)").fetchall()
+        if not any(name == "ix_dailycep_day" and unique for _, name, unique, *_ in indexes):
+            conn.exec_driver_sql("DELETE FROM dailycep")
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_dailycep_day")
+            conn.exec_driver_sql("CREATE UNIQUE INDEX ix_dailycep_day ON dailycep (day)")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_alert_created_at ON alert (created_at)"
+        )
@@ -0,0 +1,56 @@
+# backend/models/_kernels.py
+# Laços numéricos compilados com Numba (opcional) para o caminho em lote.
+# Sem numba instalado, HAS_NUMBA é False e os modelos usam os equivalentes
+# vetorizados em NumPy/SciPy (lfilter e somas acumuladas).
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+HAS_NUMBA = njit is not None
+
+
+def _ema_predictions(x: np.ndarray, alpha: float, start: float) -> Tuple[np.ndarray, float]:
+    """Previsão antes de cada ponto (EMA anterior) e a EMA final."""
+    n = x.size
+    preds = np.empty(n)
+    ema = start
+    for i in range(n):
+        preds[i] = ema
+        ema = alpha * x[i] + (1.0 - alpha) * ema
+    return preds, ema
+
+
+def _running_zscores(
+    res: np.ndarray, n0: int, mean0: float, m2_0: float
+) -> Tuple[np.ndarray, float, float]:
+    """
+    z-score de cada resíduo contra média/desvio acumulados até ele
+    (inclusive), continuando o estado de Welford (n0, mean0, m2_0).
+    """
+    zs = np.empty(res.size)
+    k = n0
+    mean = mean0
+    m2 = m2_0
+    for i in range(res.size):
+        r = res[i]
+        k += 1
+        d = r - mean
+        mean += d / k
+        m2 += d * (r - mean)
+        std = (m2 / (k - 1)) ** 0.5 if k > 1 else 0.0
+        zs[i] = (r - mean) / std if std > 0 else 0.0
+    return zs, mean, m2
+
+
+if HAS_NUMBA:
+    ema_predictions = njit(cache=True)(_ema_predictions)
+    running_zscores = njit(cache=True)(_running_zscores)
+else:
+    ema_predictions = None
+    running_zscores = None
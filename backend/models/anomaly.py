@@ -1,15 +1,23 @@
 # backend/models/anomaly.py
+import math
+from collections import deque
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import Deque, Iterable, List, Optional, Dict, Any, Tuple
 
 import numpy as np
 from sklearn.ensemble import IsolationForest
 
+from . import _kernels
+
 
 @dataclass
 class AnomalyConfig:
     contamination: float = 0.03       # porcentagem esperada de anomalias
     zscore_threshold: float = 3.0     # |z| > 3 => suspeito
+    history_size: int = 2000          # janela de resíduos usada no re-treino
+    refit_every: int = 50             # re-treina a cada N pontos
+    n_estimators: int = 50            # árvores do IsolationForest
+    max_samples: int = 256            # amostras por árvore (custo fixo de treino)
 
 
 class AnomalyDetector:
@@ -17,36 +25,66 @@ class AnomalyDetector:
     Detector de anomalias baseado em:
     - IsolationForest sobre os resíduos
     - Z-score simples para reforçar decisão
+
+    Média e desvio dos resíduos são mantidos incrementalmente (Welford),
+    então pontuar um novo ponto custa O(1) independente do histórico.
     """
 
     def __init__(self, config: Optional[AnomalyConfig] = None):
         self.config = config or AnomalyConfig()
         self._model: Optional[IsolationForest] = None
         self._fitted: bool = False
-        self._residuals_history: List[float] = []
+        self._residuals_history: Deque[float] = deque(maxlen=self.config.history_size)
+
+        # Estatísticas acumuladas (Welford)
+        self._n: int = 0
+        self._mean: float = 0.0
+        self._M2: float = 0.0
+
+        # Buffer reaproveitado para pontuar um único ponto
+        self._x_buf = np.empty((1, 1), dtype=np.float64)
 
-    def fit(self, residuals: List[float]):
-        """Treina o IsolationForest com a lista de resíduos."""
-        if len(residuals) < 10:
+    def fit(self, residuals: Iterable[float]):
+        """
+        Treina o IsolationForest com a lista de resíduos.
+
+        Cada árvore usa no máximo `max_samples` pontos (256, o padrão do
+        artigo original do Isolation Forest), então o custo de re-treino é
+        constante e não cresce com o histórico. A janela de `history_size`
+        resíduos só define de onde essas amostras são sorteadas.
+        """
+        X = np.fromiter(residuals, dtype=np.float64).reshape(-1, 1)
+        if len(X) < 10:
             self._fitted = False
             return
 
-        X = np.array(residuals, dtype=float).reshape(-1, 1)
         self._model = IsolationForest(
+            n_estimators=self.config.n_estimators,
+            max_samples=min(self.config.max_samples, len(X)),
             contamination=self.config.contamination,
             random_state=42,
+            n_jobs=1,
         )
         self._model.fit(X)
         self._fitted = True
-        self._residuals_history = list(residuals)
 
     def partial_update(self, residual: float):
-        """Atualiza histórico e re-treina eventualmente (auto-tuning)."""
-        self._residuals_history.append(float(residual))
-        # a cada 50 pontos, re-treina o modelo
-        if len(self._residuals_history) % 50 == 0:
+        """Atualiza histórico/estatísticas e re-treina eventualmente (auto-tuning)."""
+        r = float(residual)
+        self._residuals_history.append(r)
+
+        self._n += 1
+        delta = r - self._mean
+        self._mean += delta / self._n
+        self._M2 += delta * (r - self._mean)
+
+        # a cada N pontos, re-treina o modelo
+        if self._n % self.config.refit_every == 0:
             self.fit(self._residuals_history)
 
+    def _std(self) -> float:
+        return math.sqrt(self._M2 / (self._n - 1)) if self._n > 1 else 0.0
+
     def score_point(self, residual: float) -> Dict[str, Any]:
         """
         Retorna:
@@ -56,17 +94,17 @@ class AnomalyDetector:
         - is_anomaly
         """
         res = float(residual)
-        hist = np.array(self._residuals_history + [res], dtype=float)
-        mean = float(hist.mean()) if len(hist) > 0 else 0.0
-        std = float(hist.std(ddof=1)) if len(hist) > 1 else 0.0
-        z = (res - mean) / std if std > 0 else 0.0
+        std = self._std()
+        z = (res - self._mean) / std if std > 0 else 0.0
 
         score_if = 0.0
         is_iforest = False
         if self._fitted and self._model is not None:
-            score_if = float(self._model.decision_function([[res]])[0])
-            pred = int(self._model.predict([[res]])[0])  # 1 normal, -1 anomalia
-            is_iforest = pred == -1
+            self._x_buf[0, 0] = res
+            score_if = float(self._model.decision_function(self._x_buf)[0])
+            # predict() é exatamente decision_function() < 0: evita percorrer
+            # as árvores duas vezes
+            is_iforest = score_if < 0
 
         is_z = abs(z) >= self.config.zscore_threshold
         is_anomaly = is_iforest or is_z
@@ -77,3 +115,74 @@ class AnomalyDetector:
             "iforest_score": score_if,
             "is_anomaly": is_anomaly,
         }
+
+    def _running_zscores(self, res: np.ndarray) -> Tuple[np.ndarray, float, float]:
+        """
+        z-scores do lote via somas acumuladas: as estatísticas de cada
+        prefixo do lote são combinadas com o estado de Welford (Chan et al.).
+        Retorna (z, média final, M2 final).
+        """
+        k = np.arange(1, res.size + 1, dtype=float)
+        s = np.cumsum(res)
+        mean_b = s / k
+        m2_b = np.maximum(np.cumsum(res * res) - s * mean_b, 0.0)
+
+        n0 = float(self._n)
+        n = n0 + k
+        delta = mean_b - self._mean
+        mean = self._mean + delta * k / n
+        m2 = self._M2 + m2_b + delta * delta * n0 * k / n
+
+        var = np.divide(m2, n - 1, out=np.zeros_like(m2), where=n > 1)
+        std = np.sqrt(var)
+        z = np.divide(res - mean, std, out=np.zeros_like(res), where=std > 0)
+        return z, mean[-1], m2[-1]
+
+    def score_batch(self, residuals: List[float]) -> Dict[str, np.ndarray]:
+        """
+        Versão vetorizada de partial_update() + score_point() para um lote.
+
+        - z-score calculado com média/desvio acumulados até cada ponto
+          (inclusive), continuando o estado de Welford já existente
+          (kernel Numba quando disponível, somas acumuladas caso contrário)
+        - IsolationForest treinado uma única vez (histórico + lote) e
+          aplicado ao lote inteiro em uma só chamada
+
+        Retorna arrays alinhados ao lote com as mesmas chaves de score_point().
+        """
+        res = np.asarray(residuals, dtype=float)
+        if res.size == 0:
+            empty = np.zeros(0)
+            return {
+                "residual": res,
+                "zscore_residual": empty,
+                "iforest_score": empty,
+                "is_anomaly": np.zeros(0, dtype=bool),
+            }
+
+        if _kernels.HAS_NUMBA:
+            z, mean_last, m2_last = _kernels.running_zscores(res, self._n, self._mean, self._M2)
+        else:
+            z, mean_last, m2_last = self._running_zscores(res)
+
+        self._n += res.size
+        self._mean = float(mean_last)
+        self._M2 = float(m2_last)
+        self._residuals_history.extend(res.tolist())
+        self.fit(self._residuals_history)
+
+        score_if = np.zeros_like(res)
+        is_iforest = np.zeros(res.shape, dtype=bool)
+        if self._fitted and self._model is not None:
+            # Uma única passada pelas árvores para o lote inteiro
+            score_if = self._model.decision_function(res.reshape(-1, 1))
+            is_iforest = score_if < 0
+
+        is_z = np.abs(z) >= self.config.zscore_threshold
+
+        return {
+            "residual": res,
+            "zscore_residual": z,
+            "iforest_score": score_if,
+            "is_anomaly": is_iforest | is_z,
+        }
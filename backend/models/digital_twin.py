@@ -3,6 +3,11 @@ from collections import deque
 from dataclasses import dataclass
 from typing import Optional, List
 
+import numpy as np
+from scipy.signal import lfilter
+
+from . import _kernels
+
 
 @dataclass
 class EmaConfig:
@@ -16,6 +21,7 @@ class DigitalTwinModel:
     - update(value): atualiza o modelo com o valor medido
     - predict(): retorna a previsão para o próximo ponto (EMA atual)
     - get_residual(value): diferença entre o valor e a previsão
+    - predict_series(values): versão vetorizada de predict()/update() para lotes
     """
 
     def __init__(self, config: Optional[EmaConfig] = None):
@@ -47,7 +53,33 @@ class DigitalTwinModel:
         return float(value - self._last_ema)
 
     def fit_from_series(self, series: List[float]) -> None:
-        """Inicializa EMA a partir de uma série existente."""
+        """Inicializa EMA a partir de uma série existente (sem loop Python)."""
         self.reset()
-        for v in series:
-            self.update(float(v))
+        self.predict_series(series)
+
+    def predict_series(self, values: List[float]) -> np.ndarray:
+        """
+        Processa um lote inteiro de valores de uma vez.
+
+        Retorna, para cada ponto, a previsão feita antes de atualizar o modelo
+        (mesma semântica de predict() seguido de update()) e deixa a EMA
+        posicionada no último valor do lote. Usa o kernel Numba quando
+        disponível; senão, a EMA com alpha constante é avaliada como filtro
+        IIR de 1ª ordem por `lfilter`.
+        """
+        x = np.asarray(values, dtype=np.float64)
+        if x.size == 0:
+            return x
+
+        a = self.config.alpha
+        last = float(x[0]) if self._last_ema is None else self._last_ema
+        if _kernels.HAS_NUMBA:
+            preds, final = _kernels.ema_predictions(x, a, last)
+        else:
+            ema, _ = lfilter([a], [1.0, -(1.0 - a)], x, zi=[(1.0 - a) * last])
+            preds = np.concatenate(([last], ema[:-1]))
+            final = ema[-1]
+
+        self._last_ema = float(final)
+        self._history.extend(x[-self._history.maxlen:].tolist())
+        return preds
@@ -3,6 +3,8 @@ from typing import Optional
 
 
 class SamplingDecision:
+    __slots__ = ("level", "reason")
+
     def __init__(self, level: str, reason: str):
         self.level = level          # "normal", "atencao", "critico"
         self.reason = reason
@@ -11,6 +13,26 @@ class SamplingDecision:
         return {"level": self.level, "reason": self.reason}
 
 
+# Conjunto fixo de decisões possíveis: reutilizadas em vez de recriadas a
+# cada medição (tratar como imutáveis)
+_CRITICO = SamplingDecision(
+    level="critico",
+    reason="Anomalia detectada (IsolationForest ou |z| alto).",
+)
+_NO_STAT = SamplingDecision(
+    level="normal",
+    reason="Sem estatística suficiente.",
+)
+_ATENCAO = SamplingDecision(
+    level="atencao",
+    reason="Resíduo moderadamente distante da média (|z| ≥ 2).",
+)
+_NORMAL = SamplingDecision(
+    level="normal",
+    reason="Resíduo dentro de faixa esperada.",
+)
+
+
 class SamplingEngine:
     """
     Decide o nível de amostragem com base no score de anomalia.
@@ -22,25 +44,12 @@ class SamplingEngine:
         zscore_residual: Optional[float],
     ) -> SamplingDecision:
         if is_anomaly:
-            return SamplingDecision(
-                level="critico",
-                reason="Anomalia detectada (IsolationForest ou |z| alto).",
-            )
+            return _CRITICO
 
         if zscore_residual is None:
-            return SamplingDecision(
-                level="normal",
-                reason="Sem estatística suficiente.",
-            )
-
-        z = abs(zscore_residual)
-        if z >= 2:
-            return SamplingDecision(
-                level="atencao",
-                reason="Resíduo moderadamente distante da média (|z| ≥ 2).",
-            )
-
-        return SamplingDecision(
-            level="normal",
-            reason="Resíduo dentro de faixa esperada.",
-        )
+            return _NO_STAT
+
+        if abs(zscore_residual) >= 2:
+            return _ATENCAO
+
+        return _NORMAL
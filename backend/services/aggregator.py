@@ -0,0 +1,135 @@
+# backend/services/aggregator.py
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..models.cep import CepStats, capability
+
+
+@dataclass
+class RunningCep:
+    """
+    Acumulador incremental de estatísticas CEP (Welford):
+    n, média, M2 (soma dos quadrados dos desvios), mínimo e máximo.
+    """
+
+    n: int = 0
+    mean: float = 0.0
+    M2: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+    def add(self, value: float) -> None:
+        x = float(value)
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.M2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def add_many(self, values: Iterable[float]) -> None:
+        """Incorpora um lote de valores de uma vez (fórmula de Chan)."""
+        x = np.asarray(values, dtype=float)
+        if x.size == 0:
+            return
+        mean_b = float(x.mean())
+        m2_b = float(((x - mean_b) ** 2).sum())
+
+        n = self.n + x.size
+        delta = mean_b - self.mean
+        self.M2 += m2_b + delta * delta * self.n * x.size / n
+        self.mean += delta * x.size / n
+        self.n = n
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.M2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def to_stats(self, lsl: float, usl: float) -> CepStats:
+        if self.n == 0:
+            return CepStats(0.0, 0.0, 0.0, None, None, lsl, usl, 0)
+        std = self.std
+        r = self.max - self.min if self.n > 1 else 0.0
+        cp, cpk = capability(self.mean, std, lsl, usl)
+        return CepStats(self.mean, std, r, cp, cpk, lsl, usl, self.n)
+
+
+class CepAggregator:
+    """
+    Estatísticas CEP globais e diárias mantidas em memória, atualizadas a
+    cada medição gravada. Evita reler a tabela inteira a cada requisição.
+
+    - add(...): incorpora uma medição
+    - add_batch(...): incorpora um lote (upload)
+    - rebuild(rows): reconstrói a partir do banco (startup)
+    - take_dirty_days(): dias alterados desde a última gravação de DailyCep
+    """
+
+    def __init__(self):
+        self.total = RunningCep()
+        self.daily: Dict[date, RunningCep] = {}
+        self.total_anomalies: int = 0
+        self.max_measurement_id: int = 0
+        self.dirty_days: Set[date] = set()
+
+    def add(
+        self,
+        value: float,
+        timestamp: datetime,
+        is_anomaly: bool = False,
+        measurement_id: Optional[int] = None,
+    ) -> None:
+        day = timestamp.date()
+        self.total.add(value)
+        self.daily.setdefault(day, RunningCep()).add(value)
+        self.dirty_days.add(day)
+        if is_anomaly:
+            self.total_anomalies += 1
+        if measurement_id is not None:
+            self.max_measurement_id = max(self.max_measurement_id, measurement_id)
+
+    def add_batch(
+        self,
+        values: List[float],
+        timestamps: List[datetime],
+        is_anomaly: List[bool],
+        max_measurement_id: Optional[int] = None,
+    ) -> None:
+        grouped: Dict[date, List[float]] = defaultdict(list)
+        for ts, val in zip(timestamps, values):
+            grouped[ts.date()].append(val)
+
+        self.total.add_many(values)
+        for day, vals in grouped.items():
+            self.daily.setdefault(day, RunningCep()).add_many(vals)
+        self.dirty_days.update(grouped)
+        self.total_anomalies += int(sum(bool(a) for a in is_anomaly))
+        if max_measurement_id is not None:
+            self.max_measurement_id = max(self.max_measurement_id, max_measurement_id)
+
+    def rebuild(self, rows: List[Tuple[int, datetime, float, Optional[bool]]]) -> None:
+        """Reconstrói o estado a partir de tuplas (id, timestamp, valor, anomalia)."""
+        self.__init__()
+        if not rows:
+            return
+        ids, timestamps, values, anomalies = zip(*rows)
+        self.add_batch(list(values), list(timestamps), list(anomalies), max(ids))
+
+    def overall(self, lsl: float, usl: float) -> CepStats:
+        return self.total.to_stats(lsl, usl)
+
+    def take_dirty_days(self) -> Set[date]:
+        """Retorna e zera o conjunto de dias alterados."""
+        days, self.dirty_days = self.dirty_days, set()
+        return days
+
+    def mark_dirty(self, days: Iterable[date]) -> None:
+        """Devolve dias ao conjunto (ex.: se a gravação falhou)."""
+        self.dirty_days.update(days)
@@ -1,20 +1,30 @@
 # backend/services/datastore.py
-from typing import List
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import delete
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select
 
 from ..db import engine, Measurement, DailyCep, Alert
 
 
 def add_measurement(m: Measurement) -> Measurement:
-    with Session(engine) as session:
+    # flush() já preenche m.id; expire_on_commit=False evita o SELECT extra
+    # que refresh() (ou o acesso a atributos expirados) faria após o commit
+    with Session(engine, expire_on_commit=False) as session:
         session.add(m)
+        session.flush()
         session.commit()
-        session.refresh(m)
         return m
 
 
+def add_measurements_bulk(ms: List[Measurement]) -> None:
+    with Session(engine) as session:
+        session.bulk_save_objects(ms, return_defaults=False)
+        session.commit()
+
+
 def get_last_measurements(limit: int = 200) -> List[Measurement]:
     with Session(engine) as session:
         stmt = select(Measurement).order_by(Measurement.timestamp.desc()).limit(limit)
@@ -28,6 +38,64 @@ def get_all_measurements() -> List[Measurement]:
         return session.exec(stmt).all()
 
 
+HISTORY_COLUMNS = (
+    Measurement.id,
+    Measurement.timestamp,
+    Measurement.value_real,
+    Measurement.value_pred,
+    Measurement.residual,
+    Measurement.zscore_residual,
+    Measurement.iforest_score,
+    Measurement.is_anomaly,
+    Measurement.sampling_level,
+    Measurement.source,
+    Measurement.product,
+    Measurement.operation,
+    Measurement.variable,
+    Measurement.machine,
+    Measurement.section,
+    Measurement.operator,
+    Measurement.sample_id,
+)
+
+
+def get_history_rows(limit: int = 1000, since_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Histórico projetado (só as colunas expostas, sem hidratar objetos ORM),
+    em ordem crescente de id.
+
+    - sem since_id: as `limit` medições mais recentes
+    - com since_id: as primeiras `limit` medições com id > since_id
+      (paginação incremental para quem já tem o início do histórico)
+    """
+    with Session(engine) as session:
+        stmt = select(*HISTORY_COLUMNS)
+        if since_id is None:
+            stmt = stmt.order_by(Measurement.id.desc()).limit(limit)
+            rows = list(reversed(session.exec(stmt).all()))
+        else:
+            stmt = stmt.where(Measurement.id > since_id).order_by(Measurement.id.asc()).limit(limit)
+            rows = session.exec(stmt).all()
+        return [dict(row._mapping) for row in rows]
+
+
+def get_measurement_values() -> List[Tuple[int, datetime, float, Optional[bool]]]:
+    """Apenas (id, timestamp, value_real, is_anomaly), sem hidratar objetos ORM."""
+    with Session(engine) as session:
+        stmt = select(
+            Measurement.id,
+            Measurement.timestamp,
+            Measurement.value_real,
+            Measurement.is_anomaly,
+        ).order_by(Measurement.timestamp.asc())
+        return session.exec(stmt).all()
+
+
+def get_max_measurement_id() -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.max(Measurement.id))).one() or 0
+
+
 def clear_daily_cep() -> None:
     with Session(engine) as session:
         stmt = delete(DailyCep)
@@ -35,12 +103,19 @@ def clear_daily_cep() -> None:
         session.commit()
 
 
-def save_daily_cep(rows: List[DailyCep]) -> None:
+def upsert_daily_cep(rows: List[DailyCep]) -> None:
+    """Insere ou atualiza (por dia) apenas as linhas informadas."""
+    if not rows:
+        return
+    cols = [c.name for c in DailyCep.__table__.columns if c.name != "id"]
+    values = [{c: getattr(r, c) for c in cols} for r in rows]
+    stmt = sqlite_insert(DailyCep).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyCep.day],
+        set_={c: stmt.excluded[c] for c in cols if c != "day"},
+    )
     with Session(engine) as session:
-        stmt = delete(DailyCep)
         session.exec(stmt)
-        for r in rows:
-            session.add(r)
         session.commit()
 
 
@@ -52,13 +127,21 @@ def get_daily_cep() -> List[DailyCep]:
 
 def add_alert(level: str, message: str, meta: str | None = None) -> Alert:
     a = Alert(level=level, message=message, meta=meta)
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         session.add(a)
+        session.flush()
         session.commit()
-        session.refresh(a)
         return a
 
 
+def add_alerts_bulk(alerts: List[Alert]) -> None:
+    if not alerts:
+        return
+    with Session(engine) as session:
+        session.bulk_save_objects(alerts, return_defaults=False)
+        session.commit()
+
+
 def get_alerts(limit: int = 100) -> List[Alert]:
     with Session(engine) as session:
         stmt = select(Alert).order_by(Alert.created_at.desc()).limit(limit)
@@ -1,25 +1,368 @@
 # frontend/app.py
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import requests
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 API_BASE = "http://localhost:8000"
 
+# Timeouts (s): GETs são leves; POSTs incluem upload de CSV e chamadas ao Gemini
+GET_TIMEOUT = 5
+POST_TIMEOUT = 120
+
+# Sessão única com keep-alive: reaproveita as conexões TCP com o backend
+_SESSION = requests.Session()
+_SESSION.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=2, backoff_factor=0.1),
+    ),
+)
 
-def fetch_json(path: str, method: str = "GET", json=None, files=None):
+
+def _fetch_get(path: str):
+    r = _SESSION.get(f"{API_BASE}{path}", timeout=GET_TIMEOUT)
+    r.raise_for_status()
+    # orjson lê os bytes direto (sem decodificar texto) e é bem mais rápido
+    # que o json da stdlib no histórico
+    return orjson.loads(r.content)
+
+
+# GETs memoizados entre reruns; o TTL acompanha a frequência de mudança de
+# cada recurso. POSTs (que alteram dados) limpam o cache via st.cache_data.clear().
+@st.cache_data(ttl=2, show_spinner=False)
+def _fetch_get_health(path: str):
+    return _fetch_get(path)
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _fetch_get_data(path: str):
+    return _fetch_get(path)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_get_analytics(path: str):
+    return _fetch_get(path)
+
+
+def _fetch_get_cached(path: str):
+    if path.startswith("/health"):
+        return _fetch_get_health(path)
+    if path.startswith("/analytics/"):
+        return _fetch_get_analytics(path)
+    return _fetch_get_data(path)
+
+
+def _fetch_post(path: str, json=None, files=None):
     url = f"{API_BASE}{path}"
+    if files is not None:
+        r = _SESSION.post(url, files=files, timeout=POST_TIMEOUT)
+    else:
+        r = _SESSION.post(url, json=json, timeout=POST_TIMEOUT)
+    r.raise_for_status()
+    return orjson.loads(r.content)
+
+
+def fetch_json(path: str, method: str = "GET", json=None, files=None):
     if method == "GET":
-        r = requests.get(url)
+        return _fetch_get_cached(path)
     elif method == "POST":
-        if files is not None:
-            r = requests.post(url, files=files)
-        else:
-            r = requests.post(url, json=json)
+        return _fetch_post(path, json=json, files=files)
     else:
         raise ValueError("Método HTTP não suportado")
-    r.raise_for_status()
-    return r.json()
+
+
+def compact_dtypes(
+    df: "pd.DataFrame", float_cols=(), int_cols=(), cat_cols=()
+) -> "pd.DataFrame":
+    """
+    Reduz os tipos das colunas (float64 -> float32, texto repetido ->
+    category) para diminuir memória e o payload Arrow enviado ao navegador.
+    """
+    import pandas as pd
+
+    for c in float_cols:
+        if c in df:
+            df[c] = pd.to_numeric(df[c], downcast="float")
+    for c in int_cols:
+        if c in df:
+            df[c] = pd.to_numeric(df[c], downcast="integer")
+    for c in cat_cols:
+        if c in df:
+            df[c] = df[c].astype("category")
+    return df
+
+
+# ----------------- HISTÓRICO -----------------
+HISTORY_LIMIT = 1000  # mesmo padrão de /data/history
+HISTORY_CAT_COLS = (
+    "product", "operation", "variable", "machine",
+    "section", "operator", "source", "sampling_level",
+)
+
+
+def _history_frame(rows) -> "pd.DataFrame":
+    """DataFrame bruto (nomes do backend) com tipos compactos e timestamps parseados."""
+    import pandas as pd
+
+    df = compact_dtypes(
+        pd.DataFrame(rows),
+        float_cols=("value_real", "value_pred", "residual", "zscore_residual", "iforest_score"),
+        int_cols=("id",),
+        cat_cols=HISTORY_CAT_COLS,
+    )
+    # O backend serializa em ISO-8601
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601", cache=True)
+    return df
+
+
+def load_history():
+    """
+    Histórico mantido em st.session_state: depois da primeira carga, pede ao
+    backend só as medições com id maior que o último visto (since_id) e as
+    anexa, mantendo a janela das HISTORY_LIMIT mais recentes.
+    Retorna None se ainda não há medições.
+    """
+    import pandas as pd
+
+    df = st.session_state.get("history_df")
+    if df is not None:
+        rows = fetch_json(f"/data/history?since_id={st.session_state.history_last_id}")
+        if not rows:
+            return df
+        if len(rows) < HISTORY_LIMIT:
+            df = pd.concat([df, _history_frame(rows)], ignore_index=True).tail(HISTORY_LIMIT)
+            # categorias diferentes viram object no concat
+            df = compact_dtypes(df, cat_cols=HISTORY_CAT_COLS)
+        else:
+            # Salto maior que a janela (ex.: upload grande): recarrega as mais recentes
+            df = None
+
+    if df is None:
+        rows = fetch_json("/data/history")
+        if not rows:
+            return None
+        df = _history_frame(rows)
+
+    # Já vem ordenado por id: ordena só se os timestamps vierem fora de ordem
+    if not df["timestamp"].is_monotonic_increasing:
+        df = df.sort_values("timestamp")
+
+    st.session_state.history_df = df
+    st.session_state.history_last_id = int(df["id"].max())
+    return df
+
+
+# ----------------- KPIs -----------------
+# Fragmentos recebem só escalares: re-renderizar os cartões não refaz os
+# gráficos nem hasheia DataFrames
+@st.fragment
+def show_kpis(vr: float, vp: float, res: float, z: float):
+    c = st.columns(4)
+    c[0].metric("Último peso real (g)", f"{vr:.3f}")
+    c[1].metric("Previsão do Gêmeo (g)", f"{vp:.3f}")
+    c[2].metric("Resíduo (g)", f"{res:.3f}")
+    c[3].metric("Z-score do resíduo", f"{z:.2f}")
+
+
+@st.fragment
+def show_cep_kpis(mean: float, std: float, cp, cpk):
+    c = st.columns(4)
+    c[0].metric("Média global (g)", f"{mean:.3f}")
+    c[1].metric("Desvio padrão global (g)", f"{std:.3f}")
+    c[2].metric("Cp", f"{cp:.3f}" if cp is not None else "N/A")
+    c[3].metric("Cpk", f"{cpk:.3f}" if cpk is not None else "N/A")
+
+
+# ----------------- GRÁFICOS -----------------
+def _frame_key(d: "pd.DataFrame"):
+    """
+    Chave do cache dos gráficos: hash do conteúdo inteiro (o histórico tem no
+    máximo 1000 linhas e o CEP diário uma por dia, então é barato). Pega
+    também dias antigos alterados por um upload de outro cliente.
+    """
+    import pandas as pd
+
+    return (tuple(d.columns), int(pd.util.hash_pandas_object(d, index=False).sum()))
+
+
+# Figuras só são reconstruídas quando chegam dados novos; simulação/upload
+# limpam o cache junto com o dos GETs
+# (tipo pelo nome qualificado, que muda entre pandas 2 e 3: assim o pandas
+# só é importado nas páginas que o usam)
+cache_figure = st.cache_data(
+    show_spinner=False,
+    max_entries=20,
+    hash_funcs={
+        "pandas.core.frame.DataFrame": _frame_key,
+        "pandas.DataFrame": _frame_key,
+    },
+)
+
+
+@cache_figure
+def build_series_fig(df: "pd.DataFrame"):
+    import plotly.graph_objects as go
+
+    # Arrays NumPy contíguos: o Plotly serializa o buffer direto, sem
+    # passar elemento a elemento pela Series
+    ts = df["timestamp"].to_numpy()
+    vr = df["value_real"].to_numpy(dtype="float32")
+    vp = df["value_pred"].to_numpy(dtype="float32")
+
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scattergl(
+            x=ts,
+            y=vr,
+            mode="lines+markers",
+            name="Peso real (g)",
+        )
+    )
+    fig.add_trace(
+        go.Scattergl(
+            x=ts,
+            y=vp,
+            mode="lines",
+            name="Previsto (Gêmeo Digital)",
+            line=dict(dash="dash"),
+        )
+    )
+    fig.add_hrect(
+        y0=1025,
+        y1=1032,
+        fillcolor="rgba(56, 189, 248, 0.08)",
+        line_width=0,
+        annotation_text="Faixa de especificação (LSL/USL)",
+    )
+    fig.update_layout(
+        margin=dict(l=10, r=10, t=40, b=30),
+        height=400,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+    )
+    return fig
+
+
+@cache_figure
+def build_residual_fig(df: "pd.DataFrame"):
+    import plotly.graph_objects as go
+
+    ts = df["timestamp"].to_numpy()
+    res = df["residual"].to_numpy(dtype="float32")
+    # Máscara colunar: evita montar um DataFrame só com as anomalias
+    mask = df["is_anomaly_flag"].to_numpy()
+
+    fig_res = go.Figure()
+    fig_res.add_trace(
+        go.Scattergl(
+            x=ts,
+            y=res,
+            mode="lines+markers",
+            name="Resíduo (g)",
+        )
+    )
+    if mask.any():
+        fig_res.add_trace(
+            go.Scattergl(
+                x=ts[mask],
+                y=res[mask],
+                mode="markers",
+                name="Anomalias",
+                marker=dict(color="red", size=10, symbol="x"),
+            )
+        )
+    fig_res.update_layout(
+        margin=dict(l=10, r=10, t=40, b=30),
+        height=350,
+    )
+    return fig_res
+
+
+@cache_figure
+def build_daily_mean_fig(df_daily: "pd.DataFrame", lsl: float, usl: float):
+    import plotly.graph_objects as go
+
+    days = df_daily["day"].to_numpy()
+    fig_mean = go.Figure()
+    fig_mean.add_trace(
+        go.Scattergl(
+            x=days,
+            y=df_daily["mean"].to_numpy(dtype="float32"),
+            mode="lines+markers",
+            name="Média diária (X̄)",
+        )
+    )
+    fig_mean.add_hrect(
+        y0=lsl,
+        y1=usl,
+        fillcolor="rgba(52, 211, 153, 0.08)",
+        line_width=0,
+        annotation_text="Limites de especificação",
+    )
+    fig_mean.update_layout(
+        margin=dict(l=10, r=10, t=40, b=30),
+        height=350,
+    )
+    return fig_mean
+
+
+@cache_figure
+def build_daily_range_fig(df_daily: "pd.DataFrame"):
+    import plotly.graph_objects as go
+
+    days = df_daily["day"].to_numpy()
+    fig_r = go.Figure()
+    fig_r.add_trace(
+        go.Bar(
+            x=days,
+            y=df_daily["r"].to_numpy(dtype="float32"),
+            name="Amplitude (R)",
+        )
+    )
+    fig_r.update_layout(
+        margin=dict(l=10, r=10, t=40, b=30),
+        height=350,
+    )
+    return fig_r
+
+
+@cache_figure
+def build_capability_fig(df_daily: "pd.DataFrame"):
+    import plotly.graph_objects as go
+
+    days = df_daily["day"].to_numpy()
+    fig_cp = go.Figure()
+    fig_cp.add_trace(
+        go.Scattergl(
+            x=days,
+            y=df_daily["cp"].to_numpy(dtype="float32"),
+            mode="lines+markers",
+            name="Cp",
+        )
+    )
+    fig_cp.add_trace(
+        go.Scattergl(
+            x=days,
+            y=df_daily["cpk"].to_numpy(dtype="float32"),
+            mode="lines+markers",
+            name="Cpk",
+        )
+    )
+    fig_cp.add_hline(
+        y=1.33,
+        line=dict(color="green", dash="dash"),
+        annotation_text="Alvo típico (1.33)",
+    )
+    fig_cp.update_layout(
+        margin=dict(l=10, r=10, t=40, b=30),
+        height=350,
+    )
+    return fig_cp
 
 
 # ----------------- CONFIG GERAL -----------------
@@ -29,9 +372,9 @@ st.set_page_config(
     layout="wide",
 )
 
-# CSS customizado
-st.markdown(
-    """
+# CSS customizado. st.html com só <style> não ocupa espaço no layout; é
+# reenviado a cada rerun porque elementos não emitidos somem da página
+CSS = """
 <style>
     .block-container {
         padding-top: 1.5rem;
@@ -72,14 +415,13 @@ st.markdown(
         margin-bottom: 1rem;
     }
 </style>
-""",
-    unsafe_allow_html=True,
-)
+"""
+st.html(CSS)
 
 # ----------------- SIDEBAR -----------------
 with st.sidebar:
-    st.markdown('<div class="sidebar-title">🧪 SmartTwin CEP</div>', unsafe_allow_html=True)
     st.markdown(
+        '<div class="sidebar-title">🧪 SmartTwin CEP</div>'
         '<div class="sidebar-subtitle">Gêmeo Digital + CEP + IA para envase de leite UHT</div>',
         unsafe_allow_html=True,
     )
@@ -91,12 +433,20 @@ with st.sidebar:
     ]
     page = st.radio("Navegação", menu_labels, label_visibility="collapsed")
 
+    if st.button("🔄 Atualizar dados"):
+        st.cache_data.clear()
+        st.session_state.pop("history_df", None)
+
     st.markdown("---")
     st.caption("Desenvolvido por Bárbara • Projeto SmartTwin CEP")
 
 
 # ----------------- PÁGINA: MONITORAMENTO -----------------
+# pandas/plotly são importados só nas páginas que os usam (a página de IA
+# não precisa deles); o plotly é importado dentro dos builders
 if page == "📡 Monitoramento em tempo real":
+    import pandas as pd
+
     st.title("📡 Monitoramento em tempo real")
 
     col_header_left, col_header_right = st.columns([3, 2])
@@ -128,11 +478,14 @@ if page == "📡 Monitoramento em tempo real":
         )
         if file is not None and st.button("🚀 Enviar arquivo para análise"):
             try:
+                # Passa o próprio arquivo (file-like) em vez de uma cópia em bytes
+                file.seek(0)
                 data = fetch_json(
                     "/data/upload-file",
                     method="POST",
-                    files={"file": (file.name, file.getvalue())},
+                    files={"file": (file.name, file, "text/csv")},
                 )
+                st.cache_data.clear()
                 st.success(f"Arquivo importado com sucesso! Linhas processadas: {data['rows']}")
             except Exception as e:
                 st.error(f"Erro ao importar: {e}")
@@ -147,6 +500,7 @@ if page == "📡 Monitoramento em tempo real":
                     method="POST",
                     json={"value": val, "source": "simulator"},
                 )
+                st.cache_data.clear()
                 st.success("Ponto gerado e processado.")
                 st.json(res)
             except Exception as e:
@@ -156,25 +510,23 @@ if page == "📡 Monitoramento em tempo real":
     st.subheader("📡 Visão geral do comportamento")
 
     try:
-        hist = fetch_json("/data/history")
+        df = load_history()
     except Exception as e:
         st.error(f"Erro ao carregar histórico: {e}")
-        hist = []
+        df = None
 
-    if hist:
-        # DataFrame bruto com nomes do backend
-        df = pd.DataFrame(hist)
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        df = df.sort_values("timestamp")
+    if df is not None:
 
         # ---- Metadados principais (produto, operação etc.) ----
         meta_cols = ["product", "operation", "variable", "machine", "section", "operator"]
-        meta_info = {}
-        if len(df) > 0:
-            first_row = df.iloc[0]
-            for c in meta_cols:
-                if c in df.columns and pd.notna(first_row.get(c)):
-                    meta_info[c] = first_row.get(c)
+        # Depende só da primeira linha: recalcula apenas quando ela muda
+        first_id = int(df["id"].iat[0])
+        if st.session_state.get("meta_info_id") != first_id:
+            st.session_state.meta_info = {
+                c: df[c].iat[0] for c in meta_cols if c in df.columns and pd.notna(df[c].iat[0])
+            }
+            st.session_state.meta_info_id = first_id
+        meta_info = st.session_state.meta_info
 
         if meta_info:
             with st.expander("ℹ️ Contexto do processo"):
@@ -191,34 +543,30 @@ if page == "📡 Monitoramento em tempo real":
                 if meta_info.get("operator"):
                     st.write(f"**Operador:** {meta_info['operator']}")
 
-        # KPIs com último ponto
-        last_row = df.iloc[-1]
-        k1, k2, k3, k4 = st.columns(4)
-        with k1:
-            st.metric("Último peso real (g)", f"{last_row['value_real']:.3f}")
-        with k2:
-            st.metric("Previsão do Gêmeo (g)", f"{last_row['value_pred']:.3f}")
-        with k3:
-            st.metric("Resíduo (g)", f"{(last_row['residual'] or 0):.3f}")
-        with k4:
-            z_val = last_row["zscore_residual"] if last_row["zscore_residual"] is not None else 0.0
-            st.metric("Z-score do resíduo", f"{z_val:.2f}")
-
-        # Prepara colunas auxiliares
-        df["residual"] = df["residual"].fillna(0.0)
-        df["zscore_residual"] = df["zscore_residual"].fillna(0.0)
-        df["is_anomaly_flag"] = df["is_anomaly"].fillna(False).astype(bool)
-
-        # DataFrame para exibição com nomes em PT-BR
-        df_viz = df.copy()
-        rename_map = {
-            "timestamp": "Data/Hora",
-            "value_real": "Peso (g)",
-            "value_pred": "Previsto (Gêmeo)",
-            "residual": "Resíduo (g)",
-            "zscore_residual": "Z-score Resíduo",
-            "iforest_score": "Score IsolationForest",
-            "is_anomaly": "Anomalia",
+        # Prepara colunas auxiliares (uma única atribuição)
+        df = df.assign(
+            residual=df["residual"].fillna(0.0).astype("float32"),
+            zscore_residual=df["zscore_residual"].fillna(0.0).astype("float32"),
+            is_anomaly_flag=df["is_anomaly"].to_numpy(dtype=bool, na_value=False),
+        )
+
+        # KPIs com último ponto (leitura escalar direta, sem montar a linha)
+        show_kpis(
+            float(df["value_real"].iat[-1]),
+            float(df["value_pred"].iat[-1]),
+            float(df["residual"].iat[-1]),
+            float(df["zscore_residual"].iat[-1]),
+        )
+
+        # Rótulos em PT-BR aplicados só na exibição (sem copiar/renomear o DataFrame)
+        history_columns = {
+            "timestamp": st.column_config.DatetimeColumn("Data/Hora"),
+            "value_real": st.column_config.NumberColumn("Peso (g)", format="%.3f"),
+            "value_pred": st.column_config.NumberColumn("Previsto (Gêmeo)", format="%.3f"),
+            "residual": st.column_config.NumberColumn("Resíduo (g)", format="%.3f"),
+            "zscore_residual": st.column_config.NumberColumn("Z-score Resíduo", format="%.2f"),
+            "iforest_score": st.column_config.NumberColumn("Score IsolationForest", format="%.4f"),
+            "is_anomaly": st.column_config.CheckboxColumn("Anomalia"),
             "sampling_level": "Nível de Amostragem",
             "source": "Origem",
             "product": "Produto",
@@ -229,7 +577,6 @@ if page == "📡 Monitoramento em tempo real":
             "operator": "Operador",
             "sample_id": "Nº da Amostra",
         }
-        df_viz = df_viz.rename(columns=rename_map)
 
         # Abas de visualização
         tab1, tab2, tab3 = st.tabs(
@@ -238,69 +585,20 @@ if page == "📡 Monitoramento em tempo real":
 
         with tab1:
             st.markdown("#### Peso real vs Gêmeo Digital (EMA)")
-            fig = go.Figure()
-            fig.add_trace(
-                go.Scatter(
-                    x=df["timestamp"],
-                    y=df["value_real"],
-                    mode="lines+markers",
-                    name="Peso real (g)",
-                )
-            )
-            fig.add_trace(
-                go.Scatter(
-                    x=df["timestamp"],
-                    y=df["value_pred"],
-                    mode="lines",
-                    name="Previsto (Gêmeo Digital)",
-                    line=dict(dash="dash"),
-                )
-            )
-            fig.add_hrect(
-                y0=1025,
-                y1=1032,
-                fillcolor="rgba(56, 189, 248, 0.08)",
-                line_width=0,
-                annotation_text="Faixa de especificação (LSL/USL)",
-            )
-            fig.update_layout(
-                margin=dict(l=10, r=10, t=40, b=30),
-                height=400,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_series_fig(df), use_container_width=True)
 
         with tab2:
             st.markdown("#### Resíduos e anomalias")
-            fig_res = go.Figure()
-            fig_res.add_trace(
-                go.Scatter(
-                    x=df["timestamp"],
-                    y=df["residual"],
-                    mode="lines+markers",
-                    name="Resíduo (g)",
-                )
-            )
-            anomalies = df[df["is_anomaly_flag"]]
-            if not anomalies.empty:
-                fig_res.add_trace(
-                    go.Scatter(
-                        x=anomalies["timestamp"],
-                        y=anomalies["residual"],
-                        mode="markers",
-                        name="Anomalias",
-                        marker=dict(color="red", size=10, symbol="x"),
-                    )
-                )
-            fig_res.update_layout(
-                margin=dict(l=10, r=10, t=40, b=30),
-                height=350,
-            )
-            st.plotly_chart(fig_res, use_container_width=True)
+            st.plotly_chart(build_residual_fig(df), use_container_width=True)
 
         with tab3:
             st.markdown("#### Últimas medições (com metadados)")
-            st.dataframe(df_viz.tail(150), use_container_width=True)
+            st.dataframe(
+                df.tail(150),
+                column_config=history_columns,
+                hide_index=True,
+                use_container_width=True,
+            )
 
     else:
         st.info("Nenhuma medição registrada ainda. Importe um CSV ou simule dados.")
@@ -308,27 +606,28 @@ if page == "📡 Monitoramento em tempo real":
 
 # ----------------- PÁGINA: CEP + IA -----------------
 elif page == "📊 Análise CEP + IA":
+    import pandas as pd
+
     st.title("📊 Análise CEP + IA")
 
     try:
-        overview = fetch_json("/analytics/overview")
-        daily = fetch_json("/analytics/daily-cep")
-        alerts = fetch_json("/alerts")
+        # As três chamadas são independentes: em paralelo, a página espera
+        # só pela mais lenta
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            f_ov = ex.submit(fetch_json, "/analytics/overview")
+            f_daily = ex.submit(fetch_json, "/analytics/daily-cep")
+            f_alerts = ex.submit(fetch_json, "/alerts")
+        overview, daily, alerts = f_ov.result(), f_daily.result(), f_alerts.result()
     except Exception as e:
         st.error(f"Erro ao carregar análises: {e}")
         st.stop()
 
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.metric("Média global (g)", f"{overview['global_mean']:.3f}")
-    with c2:
-        st.metric("Desvio padrão global (g)", f"{overview['global_std']:.3f}")
-    with c3:
-        cp = overview["global_cp"]
-        st.metric("Cp", f"{cp:.3f}" if cp is not None else "N/A")
-    with c4:
-        cpk = overview["global_cpk"]
-        st.metric("Cpk", f"{cpk:.3f}" if cpk is not None else "N/A")
+    show_cep_kpis(
+        overview["global_mean"],
+        overview["global_std"],
+        overview["global_cp"],
+        overview["global_cpk"],
+    )
 
     st.caption(
         f"Total de pontos: {overview['total_points']} • Anomalias detectadas: {overview['total_anomalies']}"
@@ -342,92 +641,43 @@ elif page == "📊 Análise CEP + IA":
         st.markdown("#### Estatísticas diárias (X̄, R, Cp, Cpk)")
 
         if daily:
-            df_daily = pd.DataFrame(daily)
-            df_daily["day"] = pd.to_datetime(df_daily["day"])
+            df_daily = compact_dtypes(
+                pd.DataFrame(daily),
+                float_cols=("mean", "std", "r", "cp", "cpk", "lsl", "usl"),
+                int_cols=("n",),
+            )
+            df_daily["day"] = pd.to_datetime(df_daily["day"], format="ISO8601")
 
             col_cep1, col_cep2 = st.columns(2)
             with col_cep1:
-                fig_mean = go.Figure()
-                fig_mean.add_trace(
-                    go.Scatter(
-                        x=df_daily["day"],
-                        y=df_daily["mean"],
-                        mode="lines+markers",
-                        name="Média diária (X̄)",
-                    )
+                st.plotly_chart(
+                    build_daily_mean_fig(df_daily, overview["lsl"], overview["usl"]),
+                    use_container_width=True,
                 )
-                fig_mean.add_hrect(
-                    y0=overview["lsl"],
-                    y1=overview["usl"],
-                    fillcolor="rgba(52, 211, 153, 0.08)",
-                    line_width=0,
-                    annotation_text="Limites de especificação",
-                )
-                fig_mean.update_layout(
-                    margin=dict(l=10, r=10, t=40, b=30),
-                    height=350,
-                )
-                st.plotly_chart(fig_mean, use_container_width=True)
 
             with col_cep2:
-                fig_r = go.Figure()
-                fig_r.add_trace(
-                    go.Bar(
-                        x=df_daily["day"],
-                        y=df_daily["r"],
-                        name="Amplitude (R)",
-                    )
-                )
-                fig_r.update_layout(
-                    margin=dict(l=10, r=10, t=40, b=30),
-                    height=350,
-                )
-                st.plotly_chart(fig_r, use_container_width=True)
+                st.plotly_chart(build_daily_range_fig(df_daily), use_container_width=True)
 
             st.markdown("#### Cp e Cpk por dia")
-            fig_cp = go.Figure()
-            fig_cp.add_trace(
-                go.Scatter(
-                    x=df_daily["day"],
-                    y=df_daily["cp"],
-                    mode="lines+markers",
-                    name="Cp",
-                )
-            )
-            fig_cp.add_trace(
-                go.Scatter(
-                    x=df_daily["day"],
-                    y=df_daily["cpk"],
-                    mode="lines+markers",
-                    name="Cpk",
-                )
-            )
-            fig_cp.add_hline(
-                y=1.33,
-                line=dict(color="green", dash="dash"),
-                annotation_text="Alvo típico (1.33)",
-            )
-            fig_cp.update_layout(
-                margin=dict(l=10, r=10, t=40, b=30),
-                height=350,
-            )
-            st.plotly_chart(fig_cp, use_container_width=True)
+            st.plotly_chart(build_capability_fig(df_daily), use_container_width=True)
 
             st.markdown("#### Tabela CEP diária")
-            df_daily_viz = df_daily.rename(
-                columns={
-                    "day": "Dia",
+            st.dataframe(
+                df_daily,
+                column_config={
+                    "day": st.column_config.DateColumn("Dia"),
                     "n": "Nº de pontos",
-                    "mean": "Média (g)",
-                    "std": "Desvio padrão (g)",
-                    "r": "Amplitude (R)",
-                    "cp": "Cp",
-                    "cpk": "Cpk",
+                    "mean": st.column_config.NumberColumn("Média (g)", format="%.3f"),
+                    "std": st.column_config.NumberColumn("Desvio padrão (g)", format="%.3f"),
+                    "r": st.column_config.NumberColumn("Amplitude (R)", format="%.3f"),
+                    "cp": st.column_config.NumberColumn("Cp", format="%.3f"),
+                    "cpk": st.column_config.NumberColumn("Cpk", format="%.3f"),
                     "lsl": "LSL",
                     "usl": "USL",
-                }
+                },
+                hide_index=True,
+                use_container_width=True,
             )
-            st.dataframe(df_daily_viz, use_container_width=True)
         else:
             st.info("Ainda não há dados suficientes para CEP diário.")
 
@@ -449,18 +699,24 @@ elif page == "📊 Análise CEP + IA":
     with tab3:
         st.markdown("#### Alertas recentes")
         if alerts:
-            df_alerts = pd.DataFrame(alerts)
-            df_alerts["created_at"] = pd.to_datetime(df_alerts["created_at"])
-            df_alerts = df_alerts.rename(
-                columns={
-                    "created_at": "Data/Hora",
+            df_alerts = compact_dtypes(
+                pd.DataFrame(alerts),
+                int_cols=("id",),
+                cat_cols=("level",),
+            )
+            df_alerts["created_at"] = pd.to_datetime(df_alerts["created_at"], format="ISO8601", cache=True)
+            st.dataframe(
+                df_alerts,
+                column_config={
+                    "created_at": st.column_config.DatetimeColumn("Data/Hora"),
                     "level": "Nível",
                     "message": "Mensagem",
                     "meta": "Meta",
                     "id": "ID",
-                }
+                },
+                hide_index=True,
+                use_container_width=True,
             )
-            st.dataframe(df_alerts, use_container_width=True)
         else:
             st.info("Nenhum alerta registrado ainda.")
 
@@ -494,25 +750,36 @@ elif page == "🧠 Insights com IA (Gemini)":
         if "chat_history" not in st.session_state:
             st.session_state.chat_history = []
 
-        # render histórico
-        for msg in st.session_state.chat_history:
-            with st.chat_message(msg["role"]):
-                st.write(msg["content"])
+        # Fragmento: uma nova mensagem re-executa só o chat, não a página
+        @st.fragment
+        def chat_fragment():
+            # Container criado antes do chat_input: mensagens novas ficam
+            # acima da caixa de texto, junto com o histórico
+            msgs = st.container()
+            for msg in st.session_state.chat_history:
+                with msgs.chat_message(msg["role"]):
+                    st.write(msg["content"])
+
+            user_input = st.chat_input(
+                "Faça uma pergunta sobre o processo, CP, CPK, anomalias, estabilidade, etc."
+            )
+            if user_input:
+                # Desenha as novas mensagens direto, sem re-executar o fragmento
+                st.session_state.chat_history.append({"role": "user", "content": user_input})
+                with msgs.chat_message("user"):
+                    st.write(user_input)
+                try:
+                    res = fetch_json(
+                        "/llm/chat",
+                        method="POST",
+                        json={"history": st.session_state.chat_history},
+                    )
+                    answer = res["answer"]
+                except Exception as e:
+                    answer = f"Erro ao falar com Gemini: {e}"
 
-        user_input = st.chat_input(
-            "Faça uma pergunta sobre o processo, CP, CPK, anomalias, estabilidade, etc."
-        )
-        if user_input:
-            st.session_state.chat_history.append({"role": "user", "content": user_input})
-            try:
-                res = fetch_json(
-                    "/llm/chat",
-                    method="POST",
-                    json={"history": st.session_state.chat_history},
-                )
-                answer = res["answer"]
-            except Exception as e:
-                answer = f"Erro ao falar com Gemini: {e}"
+                st.session_state.chat_history.append({"role": "assistant", "content": answer})
+                with msgs.chat_message("assistant"):
+                    st.write(answer)
 
-            st.session_state.chat_history.append({"role": "assistant", "content": answer})
-            st.rerun()
+        chat_fragment()